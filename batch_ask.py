@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Offline batch question runner for Reformed Dave.
+
+Runs each question from a file through the same pipeline the Discord bot uses
+(create_prompt -> ConversationManager -> TabbyAPI -> format_response ->
+contains_blocked_phrase), without connecting to Discord, and streams one JSON
+result per question to an output file.
+
+Input may be a text file (one question per line) or a JSONL file where each
+line is either a string or an object with a "question" key and optional "id"
+and "gender" ("male"/"female") keys.
+
+Usage: python3 batch_ask.py questions.jsonl [-o results.jsonl] [-c 4]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+from config import BATCH_CONCURRENCY, BATCH_OUTPUT_FILE, MAX_RETRIES
+from utils.prompt_handler import create_prompt
+from utils.response_formatter import format_response
+from utils.conversation_manager import ConversationManager
+from utils.content_filter import load_blocked_phrases, contains_blocked_phrase
+from utils.completion import create_client, request_completion
+
+
+def question_id(question: str) -> str:
+    """Derive a stable ID from the question text, so resuming survives edits to the input file."""
+    return hashlib.sha1(question.encode("utf-8")).hexdigest()[:12]
+
+
+def load_questions(path: str) -> list[dict]:
+    """Load questions from a text or JSONL file, raising ValueError on a malformed line."""
+    questions = []
+    seen = {}
+    is_jsonl = path.endswith(".jsonl")
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            item = {"id": None, "question": line, "gender": None}
+            if is_jsonl:
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {line_number}: invalid JSON ({e})")
+
+                if isinstance(data, str):
+                    item["question"] = data
+                elif isinstance(data, dict):
+                    item["question"] = data.get("question")
+                    item["gender"] = data.get("gender")
+                    if "id" in data:
+                        item["id"] = str(data["id"])
+                else:
+                    raise ValueError(f"line {line_number}: expected a string or an object")
+
+                if not isinstance(item["question"], str) or not item["question"].strip():
+                    raise ValueError(f"line {line_number}: \"question\" must be a non-empty string")
+                if item["gender"] not in (None, "male", "female"):
+                    raise ValueError(f"line {line_number}: \"gender\" must be \"male\" or \"female\"")
+
+            if item["id"] is None:
+                item["id"] = question_id(item["question"])
+            if item["id"] in seen:
+                raise ValueError(f"line {line_number}: duplicate of line {seen[item['id']]} (id {item['id']})")
+            seen[item["id"]] = line_number
+            questions.append(item)
+    return questions
+
+
+def read_results(path: str) -> list[tuple[str, dict]]:
+    """
+    Read the result records from an existing output file.
+
+    Lines that aren't result objects (such as a partial line left by an
+    interrupted run) are skipped. Raises ValueError if the file has content but
+    no results, so a mistyped output path is never overwritten.
+    """
+    results = []
+    has_content = False
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            has_content = True
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(result, dict) and "id" in result and "status" in result:
+                results.append((line, result))
+
+    if has_content and not results:
+        raise ValueError("doesn't look like a batch results file, refusing to modify it")
+    return results
+
+
+def prepare_resume(path: str, questions: list[dict]) -> list[dict]:
+    """
+    Drop stale records from an existing output file and return the questions still to run.
+
+    Records that errored, were cut off by an interrupted run, or no longer match
+    their question in the input are removed, so the file holds at most one
+    record per ID.
+    """
+    if not os.path.exists(path):
+        return questions
+
+    current = {item["id"]: item["question"] for item in questions}
+    kept = []
+    completed = set()
+    for line, result in read_results(path):
+        result_id = str(result["id"])
+        if result["status"] == "error" or result_id in completed:
+            continue
+        if result_id in current and result.get("question") != current[result_id]:
+            print(f"Question for id {result_id} changed, running it again")
+            continue
+        completed.add(result_id)
+        kept.append(line if line.endswith("\n") else line + "\n")
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.writelines(kept)
+    os.replace(temp_path, path)
+
+    return [item for item in questions if item["id"] not in completed]
+
+
+async def ask_question(client: AsyncOpenAI, conversation_manager: ConversationManager,
+                       blocked_phrases: list, item: dict, verbose: bool = False) -> dict:
+    """Run a single question through the bot pipeline and return its result record."""
+    question = item["question"]
+    result = {
+        "id": item["id"],
+        "question": question,
+        "status": "ok",
+        "response": None,
+        "blocked_phrase": None,
+        "attempts": 0,
+        "latency_seconds": None,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "total_tokens": None,
+        "timestamp": datetime.now().isoformat()
+    }
+
+    # Check input for blocked phrases
+    has_blocked, _, blocked_phrase = contains_blocked_phrase(question, blocked_phrases)
+    if has_blocked:
+        result["status"] = "blocked_input"
+        result["blocked_phrase"] = blocked_phrase
+        return result
+
+    # Each question gets its own conversation so concurrent items can't leak context
+    channel_id = f"batch-{item['id']}"
+    start = time.perf_counter()
+
+    try:
+        completion, result["attempts"] = await request_completion(
+            client, conversation_manager, channel_id, create_prompt(question), item["gender"],
+            enable_logging=False, verbose=verbose
+        )
+        result["latency_seconds"] = round(time.perf_counter() - start, 3)
+        usage = getattr(completion, "usage", None)
+        if usage:
+            result["prompt_tokens"] = usage.prompt_tokens
+            result["completion_tokens"] = usage.completion_tokens
+            result["total_tokens"] = usage.total_tokens
+
+        response_chunks = await format_response(completion.choices[0].message.content)
+        result["response"] = response_chunks
+
+        # Check output for blocked phrases
+        for chunk in response_chunks:
+            chunk_blocked, _, blocked_phrase = contains_blocked_phrase(chunk, blocked_phrases)
+            if chunk_blocked:
+                result["status"] = "blocked_output"
+                result["blocked_phrase"] = blocked_phrase
+                break
+
+    except Exception as e:
+        if not result["attempts"]:
+            # request_completion only gives up after every attempt failed
+            result["attempts"] = MAX_RETRIES
+        result["status"] = "error"
+        result["error"] = f"{e!r}"
+        result["latency_seconds"] = round(time.perf_counter() - start, 3)
+    finally:
+        conversation_manager.clear_conversation(channel_id)
+
+    return result
+
+
+async def run_batch(questions: list[dict], output_path: str, concurrency: int, verbose: bool = False):
+    """Process questions concurrently, appending each result to the output file as it finishes."""
+    client = create_client()
+    conversation_manager = ConversationManager(verbose=verbose)
+    blocked_phrases = load_blocked_phrases()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(item):
+        async with semaphore:
+            return await ask_question(client, conversation_manager, blocked_phrases, item, verbose)
+
+    start = time.perf_counter()
+    counts = {}
+    total_tokens = 0
+    with open(output_path, "a") as out:
+        tasks = [asyncio.create_task(worker(item)) for item in questions]
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            result = await task
+            # Results are written from the event loop only, so lines never interleave
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            total_tokens += result["completion_tokens"] or 0
+            latency = "-" if result["latency_seconds"] is None else f"{result['latency_seconds']}s"
+            print(f"[{done}/{len(questions)}] {result['id']}: {result['status']} ({latency})")
+
+    elapsed = time.perf_counter() - start
+    print("------")
+    print(f"Processed {len(questions)} questions in {elapsed:.1f}s")
+    print("Status counts: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    if elapsed > 0:
+        print(f"Throughput: {len(questions) / elapsed:.2f} questions/s, {total_tokens / elapsed:.1f} completion tokens/s")
+
+
+def main():
+    """Parse arguments and run the batch."""
+    parser = argparse.ArgumentParser(description="Run a file of questions through Reformed Dave without Discord.")
+    parser.add_argument("input", help="Text file (one question per line) or JSONL file of questions")
+    parser.add_argument("-o", "--output", default=BATCH_OUTPUT_FILE, help=f"JSONL results file (default: {BATCH_OUTPUT_FILE})")
+    parser.add_argument("-c", "--concurrency", type=int, default=BATCH_CONCURRENCY, help=f"Concurrent requests (default: {BATCH_CONCURRENCY})")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing results instead of resuming")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the bot's per-request debug output")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    load_dotenv()
+    try:
+        questions = load_questions(args.input)
+    except (OSError, ValueError) as e:
+        parser.error(f"{args.input}: {e}")
+
+    if os.path.abspath(args.output) == os.path.abspath(args.input):
+        parser.error("the output file must be different from the input file")
+    try:
+        if args.restart and os.path.exists(args.output):
+            read_results(args.output)
+            os.remove(args.output)
+        remaining = prepare_resume(args.output, questions)
+    except (OSError, ValueError) as e:
+        parser.error(f"{args.output}: {e}")
+    if len(remaining) < len(questions):
+        print(f"Resuming: {len(questions) - len(remaining)} of {len(questions)} questions already done")
+    if not remaining:
+        print("Nothing to do.")
+        return
+
+    try:
+        asyncio.run(run_batch(remaining, args.output, args.concurrency, args.verbose))
+    except KeyboardInterrupt:
+        print("\nInterrupted - rerun the same command to resume.")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,13 +9,27 @@ ENABLE_PROMPT_LOGGING = True  # Set to True to log prompts
 PROMPT_LOG_FILE = "prompt_logs.txt"  # Path to prompt log file
 MAX_PROMPT_LENGTH = 55000  # Maximum length of the entire prompt in characters
 
+# Profiling Configuration (can also be toggled with !profile)
+ENABLE_PROFILING = False  # Set to True to start profiling when the bot starts
+ENABLE_STALL_DETECTION = False  # Set to True to only run the stall detector and handler timings at startup
+PROFILE_OUTPUT_DIR = "profiles"  # Directory for collapsed-stack (flamegraph) output
+PROFILE_SAMPLE_INTERVAL = 0.01  # Seconds between stack samples
+LOOP_STALL_THRESHOLD = 0.1  # Log the blocking stack when the event loop stalls this long (seconds)
+
 # Required Bot Permissions Integer
 BOT_PERMISSIONS = 114816
 
 # API Configuration
+TABBYAPI_URL = "http://127.0.0.1:5000/v1"
+MODEL_NAME = "Reformed-Christian-Bible-Expert-v2.1-12B_EXL2_4.5bpw_H8"
+MAX_TOKENS = 15872
 MAX_RETRIES = 3
 TIMEOUT_SECONDS = 30
 
+# Batch CLI Configuration (batch_ask.py)
+BATCH_CONCURRENCY = 4  # Number of questions sent to TabbyAPI at once
+BATCH_OUTPUT_FILE = "batch_results.jsonl"  # Default path for batch results
+
 # Help message
 HELP_MESSAGE = """
 🙏 **Reformed Pastor Bot Help** 🙏
@@ -24,6 +38,7 @@ Commands:
 - `!ask <question>`: Ask a theological question
 - `!about`: Display this help message
 - `!reset`: Reset conversation context (Admin only)
+- `!profile start|stalls|stop|status`: Control performance profiling (Admin only)
 
 Examples:
 - `!ask What does the Bible say about election?`
@@ -5,28 +5,25 @@ import asyncio
 import os
 import random
 import traceback
-from datetime import datetime
 
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-from openai import OpenAI
 
 from config import (
     BOT_PERMISSIONS,
     COMMAND_PREFIX,
-    ENABLE_PROMPT_LOGGING,
+    ENABLE_PROFILING,
+    ENABLE_STALL_DETECTION,
     HELP_MESSAGE,
-    MAX_PROMPT_LENGTH,
-    MAX_RETRIES,
-    MONITORING_CHANNEL_ID,
-    PROMPT_LOG_FILE,
-    TIMEOUT_SECONDS
+    MONITORING_CHANNEL_ID
 )
 from utils.prompt_handler import create_prompt
 from utils.response_formatter import format_response
 from utils.conversation_manager import ConversationManager
 from utils.content_filter import load_blocked_phrases, contains_blocked_phrase
+from utils.completion import create_client, request_completion
+from utils.profiler import profiler, timed
 from config import BOT_PERMISSIONS, COMMAND_PREFIX, HELP_MESSAGE, MAX_RETRIES, TIMEOUT_SECONDS
 
 # Initialize conversation manager
@@ -49,10 +46,7 @@ bot = commands.Bot(
 )
 
 # Initialize OpenAI client with TabbyAPI endpoint
-client = OpenAI(
-    base_url="http://127.0.0.1:5000/v1",
-    api_key=os.getenv('TABBYAPI_KEY')  # TabbyAPI doesn't require an API key
-)
+client = create_client()
 
 @bot.event
 async def on_ready():
@@ -69,6 +63,11 @@ async def on_ready():
     print(f'Invite Link: {invite_link}')
     print('------')
 
+    if ENABLE_PROFILING:
+        profiler.start(asyncio.get_running_loop())
+    elif ENABLE_STALL_DETECTION:
+        profiler.start(asyncio.get_running_loop(), sampling=False)
+
 @bot.event
 async def on_guild_join(guild):
     """Event handler for when the bot joins a new server."""
@@ -119,10 +118,39 @@ async def reset_context(ctx):
         print(traceback.format_exc())
         await ctx.reply("Sorry brother/sister, there was an error resetting the context. Please try again.")
 
+@bot.command(name='profile')
+@commands.has_permissions(administrator=True)
+async def profile_command(ctx, action: str = "status"):
+    """Start, stop, or check performance profiling (Admin only)."""
+    action = action.lower()
+    if action in ("start", "stalls"):
+        if profiler.enabled:
+            await ctx.reply("Profiling is already running.")
+            return
+        profiler.start(asyncio.get_running_loop(), sampling=action == "start")
+        print(f"Admin {ctx.author} ({ctx.author.id}) started profiling ({action})")
+        await ctx.reply("Profiling started. Use `!profile stop` to see the results.")
+    elif action == "stop":
+        if not profiler.enabled:
+            await ctx.reply("Profiling is not running.")
+            return
+        path = profiler.stop()
+        print(f"Admin {ctx.author} ({ctx.author.id}) stopped profiling")
+        written = f"Profile written to `{path}`\n" if path else ""
+        await ctx.reply(f"{written}```\n{profiler.summary()[:1800]}\n```")
+    elif action == "status":
+        if profiler.enabled:
+            await ctx.reply(f"Profiling since {profiler.started_at:%Y-%m-%d %H:%M:%S}\n```\n{profiler.summary()[:1800]}\n```")
+        else:
+            await ctx.reply("Profiling is not running.")
+    else:
+        await ctx.reply("Usage: `!profile start|stalls|stop|status`")
+
 # Track processed messages
 processed_messages = set()
 
 @bot.event
+@timed
 async def on_message(message):
     """Event handler for when a message is received."""
     # Ignore messages from the bot itself
@@ -152,7 +180,7 @@ async def on_message(message):
         return
 
     # Skip if message contains a command even if mentioned
-    if any(message.content.lower().startswith(f"{COMMAND_PREFIX}{cmd}") for cmd in ['ask', 'about', 'reset']):
+    if any(message.content.lower().startswith(f"{COMMAND_PREFIX}{cmd}") for cmd in ['ask', 'about', 'reset', 'profile']):
         return
 
     # Process mentions and replies
@@ -183,6 +211,7 @@ async def handle_text_reset(message):
         print(f"Non-admin user {message.author} ({message.author.id}) attempted to use text reset command")
         await message.reply("⚠️ Sorry brother/sister, only administrators can use this command.")
 
+@timed
 async def process_question(message, question):
     """Process questions through TabbyAPI."""
     try:
@@ -203,102 +232,18 @@ async def process_question(message, question):
         async with message.channel.typing():
             prompt = create_prompt(question)
             print(f"\nProcessing question: {question}")
-            completion = None
-
-            for attempt in range(MAX_RETRIES):
-                try:
-                    print(f"\nAttempt {attempt + 1}: Sending request to TabbyAPI")
 
-                    # Get conversation history including system message
-                    messages = conversation_manager.get_conversation(channel_id)
-
-                    # Debug log the conversation state
-                    print(f"\nCurrent conversation state:")
-                    for idx, msg in enumerate(messages):
-                        print(f"Message {idx}: {msg['role']} - First 100 chars: {msg['content'][:100]}...")
-
-                    # Get user's gender role
-                    gender = None
-                    for role in message.author.roles:
-                        if role.name.lower() == "male":
-                            gender = "male"
-                            break
-                        elif role.name.lower() == "female":
-                            gender = "female"
-                            break
-
-                    # Add current question with gender context
-                    gender_context = f"[User is {gender}] " if gender else ""
-                    messages.append({"role": "user", "content": f"{gender_context}{prompt}"})
-
-                    # Print conversation context for debugging
-                    print(f"\nSending conversation with {len(messages)} messages")
-
-                    # Calculate total prompt length
-                    total_length = sum(len(msg['content']) for msg in messages)
-                    if total_length > MAX_PROMPT_LENGTH:
-                        # Remove oldest messages until within limit
-                        while total_length > MAX_PROMPT_LENGTH and len(messages) > 2:  # Keep system and latest
-                            removed = messages.pop(1)  # Remove second message (after system)
-                            total_length -= len(removed['content'])
-                        print(f"Trimmed conversation to {len(messages)} messages to meet length limit")
-
-                    # Log prompt if enabled
-                    if ENABLE_PROMPT_LOGGING:
-                        try:
-                            with open(PROMPT_LOG_FILE, "a") as f:
-                                f.write(f"\n--- Prompt at {datetime.now().isoformat()} ---\n")
-                                for msg in messages:
-                                    f.write(f"\n[{msg['role']}]\n{msg['content']}\n")
-                                f.write("\n--------------------\n")
-                        except Exception as e:
-                            print(f"Error logging prompt: {e}")
-
-                    completion = await asyncio.wait_for(
-                        asyncio.to_thread(
-                            client.chat.completions.create,
-                            model="Reformed-Christian-Bible-Expert-v2.1-12B_EXL2_4.5bpw_H8",
-                            messages=messages,
-                            temperature=0.0,  # Set to 0 for deterministic output
-                            max_tokens=15872,
-                            top_p=1.0,  # Set to 1.0 to disable nucleus sampling
-                            frequency_penalty=0.0,  # Disable frequency penalty
-                            presence_penalty=0.0  # Disable presence penalty
-                        ),
-                        timeout=TIMEOUT_SECONDS
-                    )
-
-                    if completion and hasattr(completion, 'choices') and completion.choices:
-                        content = completion.choices[0].message.content
-                        if content and content.strip():
-                            # Store both the prompt and response in conversation history
-                            conversation_manager.add_message(channel_id, "user", prompt)
-                            conversation_manager.add_message(channel_id, "assistant", content)
-                            print(f"\nStored in conversation history:")
-                            print(f"User: {prompt[:100]}...")
-                            print(f"Assistant: {content[:100]}...")
-                            break
-                        else:
-                            print("Error: Empty content in response")
-                            raise Exception("Empty response from API")
-                    else:
-                        print(f"Error: Invalid completion structure: {completion}")
-                        raise Exception("Invalid API response structure")
-
-                    if attempt == MAX_RETRIES - 1:
-                        raise Exception("Failed to get valid response after all attempts")
-
-                except asyncio.TimeoutError:
-                    print(f"Timeout on attempt {attempt + 1}")
-                    if attempt == MAX_RETRIES - 1:
-                        raise
-                    await asyncio.sleep(1)
-                except Exception as e:
-                    print(f"TabbyAPI Error (Attempt {attempt + 1}/{MAX_RETRIES}): {e!s}")
-                    print(traceback.format_exc())
-                    if attempt == MAX_RETRIES - 1:
-                        raise
-                    await asyncio.sleep(1)
+            # Get user's gender role
+            gender = None
+            for role in message.author.roles:
+                if role.name.lower() == "male":
+                    gender = "male"
+                    break
+                elif role.name.lower() == "female":
+                    gender = "female"
+                    break
+
+            completion, _ = await request_completion(client, conversation_manager, channel_id, prompt, gender)
 
             if completion and hasattr(completion, 'choices') and completion.choices[0].message.content.strip():
                 response_chunks = await format_response(completion.choices[0].message.content)
@@ -0,0 +1,144 @@
+"""TabbyAPI completion requests shared by the bot and the batch CLI."""
+
+import asyncio
+import os
+import time
+import traceback
+from datetime import datetime
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+from config import (
+    ENABLE_PROMPT_LOGGING,
+    MAX_PROMPT_LENGTH,
+    MAX_RETRIES,
+    MAX_TOKENS,
+    MODEL_NAME,
+    PROMPT_LOG_FILE,
+    TABBYAPI_URL,
+    TIMEOUT_SECONDS
+)
+from utils.conversation_manager import ConversationManager
+from utils.profiler import profiler
+
+
+def create_client() -> AsyncOpenAI:
+    """Create an OpenAI client for the TabbyAPI endpoint."""
+    # Retries and timeouts are handled by request_completion, so a timed out
+    # attempt is cancelled instead of being retried behind our back
+    return AsyncOpenAI(
+        base_url=TABBYAPI_URL,
+        api_key=os.getenv('TABBYAPI_KEY'),  # TabbyAPI doesn't require an API key
+        max_retries=0
+    )
+
+
+def log_prompt(messages: list[dict]):
+    """Append the messages sent to the API to the prompt log."""
+    try:
+        with open(PROMPT_LOG_FILE, "a") as f:
+            f.write(f"\n--- Prompt at {datetime.now().isoformat()} ---\n")
+            for msg in messages:
+                f.write(f"\n[{msg['role']}]\n{msg['content']}\n")
+            f.write("\n--------------------\n")
+    except Exception as e:
+        print(f"Error logging prompt: {e}")
+
+
+async def request_completion(client: AsyncOpenAI, conversation_manager: ConversationManager,
+                             channel_id: str, prompt: str, gender: Optional[str] = None,
+                             enable_logging: bool = ENABLE_PROMPT_LOGGING, verbose: bool = True):
+    """
+    Send a prompt with the channel's conversation history to TabbyAPI.
+
+    Retries up to MAX_RETRIES times, storing the prompt and response in the
+    conversation history on success. Returns the completion and the number of
+    attempts made, or raises the last error if every attempt failed. Pass
+    verbose=False to only print errors.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            if verbose:
+                print(f"\nAttempt {attempt + 1}: Sending request to TabbyAPI")
+
+            # Get conversation history including system message
+            messages = conversation_manager.get_conversation(channel_id)
+
+            # Debug log the conversation state
+            if verbose:
+                print(f"\nCurrent conversation state:")
+                for idx, msg in enumerate(messages):
+                    print(f"Message {idx}: {msg['role']} - First 100 chars: {msg['content'][:100]}...")
+
+            # Add current question with gender context
+            gender_context = f"[User is {gender}] " if gender else ""
+            messages.append({"role": "user", "content": f"{gender_context}{prompt}"})
+
+            # Print conversation context for debugging
+            if verbose:
+                print(f"\nSending conversation with {len(messages)} messages")
+
+            # Calculate total prompt length
+            total_length = sum(len(msg['content']) for msg in messages)
+            if total_length > MAX_PROMPT_LENGTH:
+                # Remove oldest messages until within limit
+                while total_length > MAX_PROMPT_LENGTH and len(messages) > 2:  # Keep system and latest
+                    removed = messages.pop(1)  # Remove second message (after system)
+                    total_length -= len(removed['content'])
+                if verbose:
+                    print(f"Trimmed conversation to {len(messages)} messages to meet length limit")
+
+            # Log prompt if enabled
+            if enable_logging:
+                log_prompt(messages)
+
+            # Timed separately so profiling can tell model latency from handler overhead
+            start = time.perf_counter()
+            try:
+                completion = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=MODEL_NAME,
+                        messages=messages,
+                        temperature=0.0,  # Set to 0 for deterministic output
+                        max_tokens=MAX_TOKENS,
+                        top_p=1.0,  # Set to 1.0 to disable nucleus sampling
+                        frequency_penalty=0.0,  # Disable frequency penalty
+                        presence_penalty=0.0  # Disable presence penalty
+                    ),
+                    timeout=TIMEOUT_SECONDS
+                )
+            finally:
+                if profiler.enabled:
+                    profiler.record("tabbyapi", time.perf_counter() - start)
+
+            if completion and hasattr(completion, 'choices') and completion.choices:
+                content = completion.choices[0].message.content
+                if content and content.strip():
+                    # Store both the prompt and response in conversation history
+                    conversation_manager.add_message(channel_id, "user", prompt)
+                    conversation_manager.add_message(channel_id, "assistant", content)
+                    if verbose:
+                        print(f"\nStored in conversation history:")
+                        print(f"User: {prompt[:100]}...")
+                        print(f"Assistant: {content[:100]}...")
+                    return completion, attempt + 1
+                print("Error: Empty content in response")
+                raise Exception("Empty response from API")
+            print(f"Error: Invalid completion structure: {completion}")
+            raise Exception("Invalid API response structure")
+
+        except asyncio.TimeoutError:
+            print(f"Timeout on attempt {attempt + 1} ({channel_id})")
+            if attempt == MAX_RETRIES - 1:
+                raise
+            await asyncio.sleep(1)
+        except Exception as e:
+            print(f"TabbyAPI Error (Attempt {attempt + 1}/{MAX_RETRIES}, {channel_id}): {e!s}")
+            if verbose:
+                print(traceback.format_exc())
+            if attempt == MAX_RETRIES - 1:
+                raise
+            await asyncio.sleep(1)
+
+    raise Exception("Failed to get valid response after all attempts")
@@ -17,28 +17,34 @@ class Message:
 class ConversationManager:
     """Manages a client's conversation history."""
 
-    def __init__(self, max_messages: int = 12, max_age_minutes: int = 120):
+    def __init__(self, max_messages: int = 12, max_age_minutes: int = 120, verbose: bool = True):
         """Clear conversation history."""
         self.conversations: Dict[str, List[Message]] = {}
         self.max_messages = max_messages
         self.max_age = timedelta(minutes=max_age_minutes)
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        """Print a debug message if verbose output is enabled."""
+        if self.verbose:
+            print(message)
 
     def add_message(self, channel_id: str, role: str, content: str) -> List[Dict[str, str]]:
         """Add a message to the conversation history and return the full conversation."""
         if channel_id not in self.conversations:
             self.conversations[channel_id] = []
-            print(f"\nInitializing new conversation for channel {channel_id}")
+            self._log(f"\nInitializing new conversation for channel {channel_id}")
         else:
-            print(f"\nAdding to existing conversation in channel {channel_id} (current size: {len(self.conversations[channel_id])})")  # pylint: disable=line-too-long
+            self._log(f"\nAdding to existing conversation in channel {channel_id} (current size: {len(self.conversations[channel_id])})")  # pylint: disable=line-too-long
 
         # Add the new message
         message = Message(role=role, content=content, timestamp=datetime.now())
         self.conversations[channel_id].append(message)
-        print(f"Added {role} message, length: {len(content)} chars")
+        self._log(f"Added {role} message, length: {len(content)} chars")
 
         # Trim old messages
         self._cleanup_conversation(channel_id)
-        print(f"After cleanup: {len(self.conversations[channel_id])} messages in conversation")
+        self._log(f"After cleanup: {len(self.conversations[channel_id])} messages in conversation")
 
         # Return the updated conversation history
         return self.get_conversation(channel_id)
@@ -46,7 +52,7 @@ class ConversationManager:
     def get_conversation(self, channel_id: str) -> List[Dict[str, str]]:
         """Get conversation history formatted for API."""
         if channel_id not in self.conversations:
-            print(
+            self._log(
                 f"\nNo existing conversation for channel {channel_id}, returning system prompt only"
             )
             return [{"role": "system", "content": self._get_system_prompt()}]
@@ -59,18 +65,18 @@ class ConversationManager:
             "role": "system",
             "content": self._get_system_prompt()
         }]
-        print(f"\nBuilding conversation for channel {channel_id}")
-        print(f"Starting with system prompt ({len(self._get_system_prompt())} chars)")
+        self._log(f"\nBuilding conversation for channel {channel_id}")
+        self._log(f"Starting with system prompt ({len(self._get_system_prompt())} chars)")
 
         # Add conversation history
         for idx, msg in enumerate(self.conversations[channel_id], 1):
             if not msg.content.strip():
-                print(f"Skipping empty message at position {idx}")
+                self._log(f"Skipping empty message at position {idx}")
                 continue
-            print(f"Adding message {idx}: {msg.role} ({len(msg.content)} chars)")
+            self._log(f"Adding message {idx}: {msg.role} ({len(msg.content)} chars)")
             conversation.append({"role": msg.role, "content": msg.content})
 
-        print(f"Final conversation has {len(conversation)} messages")
+        self._log(f"Final conversation has {len(conversation)} messages")
         return conversation
 
     def _get_system_prompt(self) -> str:
@@ -102,10 +108,10 @@ class ConversationManager:
             self.conversations[channel_id] = self.conversations[channel_id][-self.max_messages:]
 
         if original_size != len(self.conversations[channel_id]):
-            print(f"Cleaned up conversation: {original_size} -> {len(self.conversations[channel_id])} messages")  # pylint: disable=line-too-long
+            self._log(f"Cleaned up conversation: {original_size} -> {len(self.conversations[channel_id])} messages")  # pylint: disable=line-too-long
 
     def clear_conversation(self, channel_id: str):
         """Clear the conversation history for a channel."""
         if channel_id in self.conversations:
-            print(f"\nClearing conversation history for channel {channel_id}")
+            self._log(f"\nClearing conversation history for channel {channel_id}")
             del self.conversations[channel_id]
@@ -0,0 +1,212 @@
+"""Opt-in profiling tools for diagnosing a sluggish bot.
+
+Provides a sampling profiler that writes collapsed stacks (readable by
+flamegraph.pl, speedscope, etc.), an event loop stall detector, and per-handler
+timing. The stall detector and timings can also run without the sampler.
+Nothing runs until the profiler is started; while it is stopped, timed
+handlers only pay for a single attribute check.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import LOOP_STALL_THRESHOLD, PROFILE_OUTPUT_DIR, PROFILE_SAMPLE_INTERVAL
+
+
+class Profiler:
+    """Samples every thread in the process and watches the event loop for stalls."""
+
+    def __init__(self, sample_interval: float = PROFILE_SAMPLE_INTERVAL,
+                 stall_threshold: float = LOOP_STALL_THRESHOLD,
+                 output_dir: str = PROFILE_OUTPUT_DIR):
+        """Set up an idle profiler."""
+        self.enabled = False
+        self.sample_interval = sample_interval
+        self.stall_threshold = stall_threshold
+        self.output_dir = output_dir
+        self.samples: Counter = Counter()
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.sampling = False
+        self.started_at: Optional[datetime] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        self._reported_beat: Optional[float] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def beat_interval(self) -> float:
+        """How often the event loop heartbeat is refreshed."""
+        return min(self.sample_interval * 2, self.stall_threshold / 10)
+
+    def start(self, loop: asyncio.AbstractEventLoop, sampling: bool = True):
+        """
+        Start profiling. Must be called from the event loop's thread.
+
+        With sampling=False only the stall detector and handler timings run.
+        """
+        if self.enabled:
+            return
+
+        self.samples = Counter()
+        self.timings = defaultdict(list)
+        self.sampling = sampling
+        self.started_at = datetime.now()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._reported_beat = None
+        self._heartbeat_task = loop.create_task(self._beat())
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.enabled = True
+        self._thread.start()
+        if sampling:
+            print(f"Profiling started (sample interval {self.sample_interval}s, stall threshold {self.stall_threshold}s)")
+        else:
+            print(f"Stall detection started (stall threshold {self.stall_threshold}s)")
+
+    def stop(self) -> Optional[str]:
+        """Stop profiling and write any collected samples, returning the output path."""
+        if not self.enabled:
+            return None
+
+        self.enabled = False
+        self._stop_event.set()
+        self._thread.join()
+        self._heartbeat_task.cancel()
+
+        path = None
+        if self.sampling:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"profile-{self.started_at:%Y%m%d-%H%M%S}.folded")
+            labels = {}
+            with open(path, "w") as f:
+                for (thread_name, codes), count in self.samples.most_common():
+                    f.write(f"{self._collapse(thread_name, codes, labels)} {count}\n")
+            print(f"Profiling stopped, {sum(self.samples.values())} samples written to {path}")
+        else:
+            print("Stall detection stopped")
+
+        print(self.summary())
+        return path
+
+    def record(self, name: str, duration: float):
+        """Record how long a handler took."""
+        self.timings[name].append(duration)
+
+    def summary(self) -> str:
+        """Get a table of handler timings collected so far."""
+        if not self.timings:
+            return "No handler timings recorded."
+
+        lines = [f"{'handler':<24} {'calls':>6} {'mean ms':>9} {'max ms':>9} {'total s':>8}"]
+        for name, durations in sorted(self.timings.items()):
+            lines.append(
+                f"{name:<24} {len(durations):>6} {sum(durations) / len(durations) * 1000:>9.1f} "
+                f"{max(durations) * 1000:>9.1f} {sum(durations):>8.2f}"
+            )
+        return "\n".join(lines)
+
+    async def _beat(self):
+        """Keep updating the heartbeat, and log the full length of any stall once the loop recovers."""
+        while True:
+            previous = self._heartbeat
+            self._heartbeat = time.monotonic()
+            gap = self._heartbeat - previous
+            if gap > self.stall_threshold:
+                if self._reported_beat == previous:
+                    print(f"Event loop recovered after a {gap * 1000:.0f}ms stall")
+                else:
+                    # The stall ended before the profiler thread noticed it
+                    print(f"\n⚠️ Event loop stalled for {gap * 1000:.0f}ms (stack not captured)")
+            await asyncio.sleep(self.beat_interval)
+
+    def _run(self):
+        """Profiler thread: take stack samples and check the loop heartbeat."""
+        own_id = threading.get_ident()
+        interval = self.sample_interval if self.sampling else self.beat_interval
+        names = self._thread_names()
+
+        while not self._stop_event.wait(interval):
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            if self.sampling:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    if thread_id not in names:
+                        names = self._thread_names()
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    self.samples[(names.get(thread_id, str(thread_id)), tuple(codes))] += 1
+
+            # Any stall longer than the threshold leaves the heartbeat at least that old
+            heartbeat = self._heartbeat
+            gap = time.monotonic() - heartbeat
+            if gap > self.stall_threshold and self._reported_beat != heartbeat:
+                self._reported_beat = heartbeat
+                self._report_stall(gap, frames.get(self._loop_thread_id))
+
+    @staticmethod
+    def _thread_names() -> Dict[int, str]:
+        """Map thread IDs to names."""
+        return {thread.ident: thread.name for thread in threading.enumerate()}
+
+    @staticmethod
+    def _collapse(thread_name: str, codes: tuple, labels: dict) -> str:
+        """Turn a leaf-first tuple of code objects into a root-first, semicolon separated stack."""
+        stack = [thread_name]
+        for code in reversed(codes):
+            if code not in labels:
+                labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            stack.append(labels[code])
+        return ";".join(stack)
+
+    @staticmethod
+    def _report_stall(gap: float, frame):
+        """Log the coroutine and stack that are blocking the event loop."""
+        if frame is None:
+            return
+
+        coroutine = None
+        current = frame
+        while current is not None:
+            if current.f_code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+                coroutine = current.f_code.co_name
+                break
+            current = current.f_back
+
+        print(f"\n⚠️ Event loop stalled for {gap * 1000:.0f}ms so far in coroutine {coroutine or '<none>'}")
+        print("".join(traceback.format_stack(frame)))
+
+
+# Shared profiler for the bot process
+profiler = Profiler()
+
+
+def timed(func):
+    """Record the run time of an async handler while the profiler is enabled."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return await func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profiler.record(name, time.perf_counter() - start)
+
+    return wrapper
@@ -4,6 +4,8 @@ import re
 import asyncio
 import random
 
+from utils.profiler import timed
+
 def strip_think_tags(text: str) -> str:
     """Remove content between <think> and </think> tags."""
     # Match everything between and including <think> and </think> tags
@@ -33,6 +35,7 @@ def split_into_chunks(text: str, chunk_size: int) -> list[str]:
         
     return chunks
 
+@timed
 async def format_response(response: str) -> list[str]:
     """
     Format the LLM response and handle long messages.